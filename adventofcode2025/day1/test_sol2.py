@@ -1,13 +1,179 @@
 # run this programm with the command: pytest
 
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from functools import reduce
 from math import floor
 
+import numpy as np
+import pytest
+
+def parse_rotations(data):
+    """
+    Parse a rotation log like "L68\nR48" into a signed int64 array
+
+    Args:
+        data (str | bytes): The whole rotation log
+
+    Returns:
+        rotations (np.ndarray): Left rotations are negative, right rotations positive
+    """
+    if isinstance(data, str):
+        data = data.encode()
+
+    data = data.replace(b"\r", b"")
+    if not data.endswith(b"\n"):
+        data += b"\n"
+
+    buf = np.frombuffer(data, dtype=np.uint8)
+
+    newline = buf == ord("\n")
+    ends = np.flatnonzero(newline)
+    starts = np.concatenate(([0], ends[:-1] + 1))
+
+    # which line does every byte belong to?
+    line = np.cumsum(newline) - newline
+
+    # only lines starting with L or R are rotations, skip the others
+    keep = (ends > starts) & ((buf[starts] == ord("L")) | (buf[starts] == ord("R")))
+
+    # every digit is worth 10 to the power of the digits following it in its line,
+    # so trailing spaces don't shift anything. Digits of skipped lines are
+    # ignored, otherwise reduceat would add them to the rotation before.
+    digits = (buf >= ord("0")) & (buf <= ord("9")) & keep[line]
+    seen = np.cumsum(digits)
+    exponent = np.where(digits, seen[ends[line]] - seen, 0)
+
+    # int64 holds 18 digits for sure
+    if exponent.size and exponent.max() >= 18:
+        raise ValueError("Rotations with more than 18 digits don't fit into int64")
+
+    values = np.where(digits, (buf.astype(np.int64) - ord("0")) * 10 ** exponent, 0)
+
+    starts = starts[keep]
+
+    magnitude = np.add.reduceat(values, starts) if starts.size else np.zeros(0, dtype=np.int64)
+    sign = np.where(buf[starts] == ord("L"), -1, 1)
+
+    return sign * magnitude
+
+def read_chunks(f, chunksize=1 << 20, size=None):
+    """
+    Read a rotation log in fixed size byte chunks, cut at line boundaries
+
+    Args:
+        f: A binary file object, like open(path, "rb") or sys.stdin.buffer
+        chunksize (int): How many bytes to read at once
+        size (int): Stop after this many bytes, read everything if None
+
+    Returns:
+        A generator of byte strings, each holding only complete lines
+    """
+    rest = b""
+
+    while True:
+        if size is not None:
+            chunksize = min(chunksize, size)
+            size -= chunksize
+
+        chunk = f.read(chunksize) if chunksize else b""
+        if not chunk:
+            break
+
+        chunk = rest + chunk
+
+        # keep the unfinished last line for the next chunk
+        cut = chunk.rfind(b"\n") + 1
+        rest = chunk[cut:]
+
+        if cut:
+            yield chunk[:cut]
+
+    if rest.strip():
+        yield rest
+
+def summarize_rotations(rotations, block=4096):
+    """
+    Summarize a segment of rotations for every possible start position
+
+    Args:
+        rotations (np.ndarray): Signed rotations of the segment
+        block (int): How many rotations to evaluate at once, bounds the memory
+
+    Returns:
+        (displacement, passed, stopped): The net rotation of the segment, and two
+        arrays indexed by start position counting zero crossings and stops at zero
+    """
+    rotations = np.asarray(rotations, dtype=np.int64)
+    starts = np.arange(100, dtype=np.int64)[:, None]
+
+    summary = (0, np.zeros(100, dtype=np.int64), np.zeros(100, dtype=np.int64))
+
+    for i in range(0, rotations.size, block):
+        part = rotations[i:i+block]
+
+        # the same computation as Safe.replay, for all 100 starts at once
+        after = starts + np.cumsum(part)
+        before = after - part
+
+        crossings = np.where(part >= 0,
+                             after // 100 - before // 100,
+                             (before - 1) // 100 - (after - 1) // 100)
+
+        summary = combine_summaries(summary, (int(part.sum()),
+                                              crossings.sum(axis=1),
+                                              np.count_nonzero(after % 100 == 0, axis=1)))
+
+    return summary
+
+def combine_summaries(first, second):
+    "Compose two segment summaries, first is replayed before second"
+    displacement1, passed1, stopped1 = first
+    displacement2, passed2, stopped2 = second
+
+    # where does the second segment start for every start of the first?
+    shifted = (np.arange(100) + displacement1) % 100
+
+    return (displacement1 + displacement2,
+            passed1 + passed2[shifted],
+            stopped1 + stopped2[shifted])
+
+def shard_offsets(path, shards):
+    "Split a file into byte ranges of roughly equal size that end on line boundaries"
+    size = os.path.getsize(path)
+    offsets = [0]
+
+    with open(path, "rb") as f:
+        for i in range(1, shards):
+            f.seek(max(size * i // shards, offsets[-1]))
+            f.readline()
+            offsets.append(min(f.tell(), size))
+
+    offsets.append(size)
+
+    return [(start, end) for start, end in zip(offsets, offsets[1:]) if start < end]
+
+def summarize_shard(path, start, end):
+    "Summarize the rotations stored in the bytes start to end of a file"
+    summary = summarize_rotations([])
+
+    with open(path, "rb") as f:
+        f.seek(start)
+        for chunk in read_chunks(f, size=end - start):
+            summary = combine_summaries(summary, summarize_rotations(parse_rotations(chunk)))
+
+    return summary
+
+
 class Safe:
     "Model a safe as found in https://adventofcode.com/2025/day/1/"
     # what is the wheels dial pointing at
     dial = 50
     # how often was the wheel turned across 0?
     passed_zero = 0
+    # how often did a rotation stop at 0? (part 1)
+    stopped_zero = 0
 
     def set_dial(self, value):
         "Set the dial of the safe to a value"
@@ -15,17 +181,69 @@ class Safe:
         if self.dial == 0:
             self.passed_zero += 1
 
+    def rotate(self, x):
+        "Rotate the dial x clicks, negative x turns left, in constant time"
+        x = int(x)
+
+        if x >= 0:
+            # multiples of 100 in (dial, dial + x]
+            self.passed_zero += (self.dial + x) // 100
+        else:
+            # multiples of 100 in [dial + x, dial - 1]
+            self.passed_zero += (self.dial - 1) // 100 - (self.dial + x - 1) // 100
+
+        self.dial = (self.dial + x) % 100
+        if self.dial == 0:
+            self.stopped_zero += 1
+
+    def replay(self, rotations):
+        "Apply a whole array of signed rotations at once using cumulative sums"
+        rotations = np.asarray(rotations, dtype=np.int64)
+        if rotations.size == 0:
+            return
+
+        # unwrapped dial positions after each rotation
+        after = self.dial + np.cumsum(rotations)
+        before = after - rotations
+
+        right = rotations >= 0
+        crossings = np.where(right,
+                             after // 100 - before // 100,
+                             (before - 1) // 100 - (after - 1) // 100)
+
+        self.passed_zero += int(crossings.sum())
+        self.stopped_zero += int(np.count_nonzero(after % 100 == 0))
+        self.dial = int(after[-1] % 100)
+
     def rotate_left(self, x):
         "Rotate the dial to the left x times"
-        x = int(x)
-        for i in range(x):
-            self.set_dial(-1)
+        self.rotate(-int(x))
 
     def rotate_right(self, x):
         "rotate the dial to the right x times"
-        x = int(x)
-        for i in range(x):
-            self.set_dial(1)
+        self.rotate(int(x))
+
+    def replay_file(self, f, chunksize=1 << 20):
+        "Replay a rotation log from a binary file object chunk by chunk"
+        for chunk in read_chunks(f, chunksize):
+            self.replay(parse_rotations(chunk))
+
+    def replay_parallel(self, path, processes=None):
+        "Replay a rotation log file split into shards on a process pool"
+        processes = processes or os.cpu_count()
+        shards = shard_offsets(path, processes)
+
+        with ProcessPoolExecutor(processes) as pool:
+            summaries = list(pool.map(summarize_shard,
+                                      [path] * len(shards),
+                                      [start for start, end in shards],
+                                      [end for start, end in shards]))
+
+        displacement, passed, stopped = reduce(combine_summaries, summaries, summarize_rotations([]))
+
+        self.passed_zero += int(passed[self.dial])
+        self.stopped_zero += int(stopped[self.dial])
+        self.dial = (self.dial + displacement) % 100
 
     def __str__(self):
         return f" dial = {self.dial} \n passed_zero = {self.passed_zero}"
@@ -82,21 +300,143 @@ def test_safe():
     assert safe.dial == 32
     assert safe.passed_zero == 6
 
-def main():
+def test_rotate_matches_clicks():
+    "The closed form rotation counts the same zeros as clicking one by one"
+    rotations = [0, 1, -1, 50, -50, 99, -99, 100, -100, 101, -101, 250, -250, 999, -999]
+
+    for start in range(100):
+        for x in rotations:
+            safe = Safe()
+            safe.dial = start
+            safe.rotate(x)
+
+            clicks = Safe()
+            clicks.dial = start
+            for i in range(abs(x)):
+                clicks.set_dial(1 if x > 0 else -1)
+
+            assert safe.dial == clicks.dial
+            assert safe.passed_zero == clicks.passed_zero
+
+def test_rotate_million_clicks():
+    "Huge rotations do not click through every position"
     safe = Safe()
-    lines = []
+    safe.rotate_right(1000000)
+    assert safe.dial == 50
+    assert safe.passed_zero == 10000
+
+    safe.rotate_left(1000050)
+    assert safe.dial == 0
+    assert safe.passed_zero == 20001
+
+def test_parse_rotations():
+    rotations = parse_rotations("L68\nL30\r\nR48\n\nL5\nR1000")
+    assert rotations.dtype == np.int64
+    assert list(rotations) == [-68, -30, 48, -5, 1000]
+
+def test_parse_rotations_trailing_spaces():
+    assert list(parse_rotations("L68 \nR5\t\n  \nR7  ")) == [-68, 5, 7]
+
+def test_parse_rotations_skipped_lines():
+    "Lines that are no rotations don't add their digits to other rotations"
+    assert list(parse_rotations("R5\nX7\nL3")) == [5, -3]
+    assert list(parse_rotations("R5\n# 12 comment\nL3")) == [5, -3]
+    assert list(parse_rotations("R5\n# 12345678901234567890\nL3")) == [5, -3]
+
+def test_parse_rotations_too_long():
+    assert list(parse_rotations("R123456789012345678")) == [123456789012345678]
+
+    with pytest.raises(ValueError):
+        parse_rotations("R12345678901234567890")
 
+def test_replay():
+    "The example from the puzzle, replayed in one go"
+    safe = Safe()
+    safe.replay(parse_rotations("L68\nL30\nR48\nL5\nR60\nL55\nL1\nL99\nR14\nL82"))
+
+    assert safe.dial == 32
+    assert safe.passed_zero == 6
+    assert safe.stopped_zero == 3
+
+def test_replay_matches_rotate():
     with open("data.txt", "r") as f:
-        lines = f.read().splitlines()
+        data = f.read()
+
+    batch = Safe()
+    batch.replay(parse_rotations(data))
+
+    single = Safe()
+    for line in data.splitlines():
+        single.rotate(int(line[1:]) if line[0] == "R" else -int(line[1:]))
+
+    assert batch.dial == single.dial
+    assert batch.passed_zero == single.passed_zero
+    assert batch.stopped_zero == single.stopped_zero
+
+def test_read_chunks():
+    from io import BytesIO
+
+    f = BytesIO(b"L68\nL30\nR48\nL5")
+    assert list(read_chunks(f, 5)) == [b"L68\n", b"L30\n", b"R48\n", b"L5"]
+
+def test_replay_file_matches_replay():
+    "The chunk size must not change the result"
+    with open("data.txt", "rb") as f:
+        batch = Safe()
+        batch.replay(parse_rotations(f.read()))
+
+    for chunksize in [1, 7, 4096]:
+        with open("data.txt", "rb") as f:
+            stream = Safe()
+            stream.replay_file(f, chunksize)
+
+        assert stream.dial == batch.dial
+        assert stream.passed_zero == batch.passed_zero
+        assert stream.stopped_zero == batch.stopped_zero
+
+def test_combine_summaries():
+    "Summaries of two halves combine to the summary of the whole"
+    rotations = parse_rotations("L68\nL30\nR48\nL5\nR60\nL55\nL1\nL99\nR14\nL82")
+
+    displacement, passed, stopped = combine_summaries(summarize_rotations(rotations[:4]),
+                                                      summarize_rotations(rotations[4:]))
+    whole = summarize_rotations(rotations, block=3)
+
+    assert displacement == whole[0] == -218
+    assert list(passed) == list(whole[1])
+    assert list(stopped) == list(whole[2])
+
+    # the example starts at 50
+    assert passed[50] == 6
+    assert stopped[50] == 3
+
+def test_replay_parallel_matches_replay():
+    with open("data.txt", "rb") as f:
+        batch = Safe()
+        batch.replay(parse_rotations(f.read()))
+
+    for processes in [1, 3]:
+        parallel = Safe()
+        parallel.replay_parallel("data.txt", processes)
+
+        assert parallel.dial == batch.dial
+        assert parallel.passed_zero == batch.passed_zero
+        assert parallel.stopped_zero == batch.stopped_zero
+
+def main():
+    "run: python test_sol2.py [rotation log, or - for stdin]"
+    safe = Safe()
 
-    for line in lines:
-        if line[0] == "R":
-            safe.rotate_right(line[1:])
+    path = sys.argv[1] if len(sys.argv) > 1 else "data.txt"
 
-        if line[0] == "L":
-            safe.rotate_left(line[1:])
+    if path == "-":
+        safe.replay_file(sys.stdin.buffer)
+    else:
+        with open(path, "rb") as f:
+            safe.replay_file(f)
 
     print(safe)
+    print(f" stopped_zero = {safe.stopped_zero}")
 
 if __name__ == '__main__':
     main()
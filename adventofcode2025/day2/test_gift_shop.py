@@ -1,6 +1,38 @@
 #!/usr/bin/env python
 # see: https://adventofcode.com/2025/day/2
-from math import floor, ceil
+import os
+from math import floor, ceil, gcd
+from functools import lru_cache, reduce
+from itertools import combinations
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+@lru_cache(maxsize=None)
+def maximal_periods(length):
+    """
+    Return the largest proper divisors of length, the only periods worth testing
+
+    A pattern of period d also has period e when d divides e, so only the
+    divisors length/p for the primes p of length are needed.
+
+    Returns:
+        A tuple of (period, multiplier), where a number repeats a pattern of
+        period digits exactly if it is divisible by multiplier = 1..01..01
+    """
+    periods = []
+    rest, prime = length, 2
+
+    while rest > 1:
+        if rest % prime == 0:
+            period = length // prime
+            periods.append((period, (10**length - 1) // (10**period - 1)))
+
+            while rest % prime == 0:
+                rest //= prime
+
+        prime += 1
+
+    return tuple(periods)
 
 class GiftShop:
     "Model the gift shop"
@@ -17,6 +49,33 @@ class GiftShop:
         # first part of the identifier should not match the second half
         return not identifier[:id_middle] == identifier[id_middle:]
 
+    def check_number(self, number, length):
+        "Same as check_id, but for an integer with length digits"
+        # uneven numbers can't repeat
+        if length % 2 == 1:
+            return True
+
+        # split the number in half
+        high, low = divmod(number, 10**(length // 2))
+
+        return high != low
+
+    def periods(self, length):
+        "Return the largest periods a bad identifier of length digits can have"
+        # halves
+        if length % 2 == 0:
+            return [length // 2]
+
+        return []
+
+    def digits(self, number):
+        "Return the amount of digits of a positive integer"
+        length = 1
+        while number >= 10**length:
+            length += 1
+
+        return length
+
     def split_range(self, idrange):
         "Return the list of a range defined by a string of start and endpoint"
         "  example: '1-10' returns ['1', '2', ..., '10']"
@@ -25,16 +84,179 @@ class GiftShop:
 
         return [str(x) for x in range(int(startid), int(endid)+1)]
 
+    def parse_ranges(self, ids, split_lengths=False):
+        """
+        Parse a string of ids into sorted, merged ranges
+
+        Overlapping, touching and duplicated ranges are merged so no id is
+        scanned twice.
+
+        Args:
+            ids (str): Something like "11-22,95-115"
+            split_lengths (bool): Also split ranges where the digit count changes
+
+        Returns:
+            ranges (list): Sorted list of disjoint (start, end) tuples
+        """
+        ranges = []
+
+        for idrange in ids.split(","):
+            startid, endid = idrange.split("-")
+            ranges.append((int(startid), int(endid)))
+
+        merged = []
+        for start, end in sorted(ranges):
+            if merged and start <= merged[-1][1] + 1:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+            else:
+                merged.append((start, end))
+
+        if not split_lengths:
+            return merged
+
+        # the repeat structure only depends on the digit count
+        split = []
+        for start, end in merged:
+            while self.digits(start) < self.digits(end):
+                bound = 10**self.digits(start)
+                split.append((start, bound - 1))
+                start = bound
+
+            split.append((start, end))
+
+        return split
+
     def bad_ids(self, ids):
         "Return a generator of bad ids from a string of ids"
         idrange = ids.split(",")
         for i in idrange:
-            idlist = self.split_range(i)
+            startid, endid = i.split("-")
+            startid, endid = int(startid), int(endid)
+
+            # walk the range lazily, only tracking the digit count
+            length = self.digits(startid)
+            bound = 10**length
+
+            for id1 in range(startid, endid+1):
+                if id1 == bound:
+                    length += 1
+                    bound *= 10
 
-            for id1 in idlist:
                 # Id is not good?
-                if not self.check_id(id1):
-                    yield id1
+                if not self.check_number(id1, length):
+                    yield str(id1)
+
+    def repeat_counts(self, length):
+        "Return how often a pattern may repeat in an identifier of length digits"
+        # exactly twice
+        if length % 2 == 0:
+            return [2]
+
+        return []
+
+    def pattern_ids(self, start, end):
+        """
+        Generate the bad ids between start and end without looking at the good ones
+
+        A pattern p of length L repeated k times is the number
+        p * (10^((k-1)L) + ... + 10^L + 1), so for every length and repeat count
+        we only need to find the range of patterns that lands inside [start, end].
+
+        Args:
+            start (int): First id of the range
+            end (int):   Last id of the range, inclusive
+
+        Returns:
+            A generator of the bad ids as int, in ascending order
+        """
+        for length in range(len(str(start)), len(str(end)) + 1):
+            # the part of the range that has length digits
+            low  = max(start, 10**(length-1))
+            high = min(end, 10**length - 1)
+
+            # a number like 222222 is a repeat of 2, 22 and 222
+            found = set()
+
+            for k in self.repeat_counts(length):
+                plen = length // k
+                multiplier = sum(10**(plen*i) for i in range(k))
+
+                first = max(10**(plen-1), -(-low // multiplier))
+                last  = min(10**plen - 1, high // multiplier)
+
+                found.update(p * multiplier for p in range(first, last+1))
+
+            yield from sorted(found)
+
+    def period_totals(self, low, high, length, period):
+        """
+        Count and sum the ids of length digits between low and high, that
+        repeat a pattern of period digits
+
+        Returns:
+            (count, total): Amount of those ids and their sum
+        """
+        multiplier = sum(10**(period*i) for i in range(length // period))
+
+        first = max(10**(period-1), -(-low // multiplier))
+        last  = min(10**period - 1, high // multiplier)
+
+        if first > last:
+            return 0, 0
+
+        # arithmetic series of the patterns, times the multiplier
+        count = last - first + 1
+        return count, multiplier * (first + last) * count // 2
+
+    def count_and_sum(self, start, end):
+        """
+        Count and sum the bad ids between start and end without enumerating them
+
+        A number repeating patterns of period d and e also repeats the pattern of
+        period gcd(d, e), so the overlap between periods is handled by inclusion
+        and exclusion over the largest periods.
+
+        Args:
+            start (int): First id of the range
+            end (int):   Last id of the range, inclusive
+
+        Returns:
+            (count, total): Amount of bad ids and their sum
+        """
+        count, total = 0, 0
+
+        for length in range(len(str(start)), len(str(end)) + 1):
+            low  = max(start, 10**(length-1))
+            high = min(end, 10**length - 1)
+
+            periods = self.periods(length)
+
+            for size in range(1, len(periods) + 1):
+                sign = 1 if size % 2 == 1 else -1
+
+                for subset in combinations(periods, size):
+                    c, t = self.period_totals(low, high, length, reduce(gcd, subset))
+                    count += sign * c
+                    total += sign * t
+
+        return count, total
+
+    def bad_id_totals(self, ids):
+        "Return the count and sum of all bad ids from a string of ids"
+        count, total = 0, 0
+
+        for startid, endid in self.parse_ranges(ids):
+            c, t = self.count_and_sum(startid, endid)
+            count += c
+            total += t
+
+        return count, total
+
+    def generate_bad_ids(self, ids):
+        "Same as bad_ids, but generates the bad ids arithmetically"
+        for startid, endid in self.parse_ranges(ids, split_lengths=True):
+            for id1 in self.pattern_ids(startid, endid):
+                yield str(id1)
 
 class GiftShopPartTwo(GiftShop):
     "Model part two of the gift shop"
@@ -45,22 +267,99 @@ class GiftShopPartTwo(GiftShop):
         # Ensure identifier is a string
         identifier = str(identifier)
 
-        # Identifiers of length 1 are always valid
-        if len(identifier) <= 1:
-            return True
-
-        for r in range(1, floor(len(identifier)/2)+1):
-            # we want to nibble parts from left side of the identifier
-            # to see if whatever we nibbled off, is a pattern?
-            pattern   = identifier[:r]
+        return self.check_number(int(identifier), len(identifier))
 
-            # if our pattern is valid, it replaces everything inside the identifier
-            # string, leaving the remainder empty
-            if '' == identifier.replace(pattern, ''):
+    def check_number(self, number, length):
+        "Same as check_id, but for an integer with length digits"
+        # Identifiers of length 1 have no periods and are always valid
+        for period, multiplier in maximal_periods(length):
+            # a repeated pattern is a multiple of 1..01..01 with period digits
+            if number % multiplier == 0:
                 return False
-        
+
         return True
 
+    def periods(self, length):
+        "Return the largest periods a bad identifier of length digits can have"
+        return [period for period, multiplier in maximal_periods(length)]
+
+    def repeat_counts(self, length):
+        "Return how often a pattern may repeat in an identifier of length digits"
+        # any repetition of at least two
+        return [k for k in range(2, length+1) if length % k == 0]
+
+def scan_chunk(chunk):
+    """
+    Scan a range of ids with a constant digit count for both parts in one pass
+
+    Args:
+        chunk (tuple): (start, end) of the ids, inclusive
+
+    Returns:
+        (count1, total1, count2, total2): Amount and sum of bad ids for part 1 and 2
+    """
+    start, end = chunk
+    one, two = GiftShop(), GiftShopPartTwo()
+    length = one.digits(start)
+
+    count1, total1, count2, total2 = 0, 0, 0, 0
+
+    for number in range(start, end+1):
+        # every bad id of part 1 is also a bad id of part 2
+        if two.check_number(number, length):
+            continue
+
+        count2 += 1
+        total2 += number
+
+        if not one.check_number(number, length):
+            count1 += 1
+            total1 += number
+
+    return count1, total1, count2, total2
+
+def split_chunks(ranges, chunksize):
+    "Split (start, end) ranges into chunks of at most chunksize ids"
+    for start, end in ranges:
+        for chunkstart in range(start, end+1, chunksize):
+            yield chunkstart, min(chunkstart + chunksize - 1, end)
+
+def parallel_totals(ids, processes=None, chunksize=100000):
+    """
+    Scan all ids on a process pool and add up the results of every chunk
+
+    The chunks only depend on the input and chunksize, so the result is the same
+    for any amount of worker processes. Only a few chunks per worker are in
+    flight at a time, so wide ranges don't create millions of futures.
+
+    Args:
+        ids (str): Something like "11-22,95-115"
+        processes (int): Amount of worker processes, all cores if None
+        chunksize (int): Maximum amount of ids scanned by one task
+
+    Returns:
+        (count1, total1, count2, total2): Amount and sum of bad ids for part 1 and 2
+    """
+    processes = processes or os.cpu_count()
+    ranges = GiftShop().parse_ranges(ids, split_lengths=True)
+    totals = [0, 0, 0, 0]
+
+    with ProcessPoolExecutor(processes) as pool:
+        limit = 4 * processes
+        pending = deque()
+
+        for chunk in split_chunks(ranges, chunksize):
+            # wait for the oldest chunk before submitting more
+            if len(pending) >= limit:
+                totals = [a + b for a, b in zip(totals, pending.popleft().result())]
+
+            pending.append(pool.submit(scan_chunk, chunk))
+
+        for future in pending:
+            totals = [a + b for a, b in zip(totals, future.result())]
+
+    return tuple(totals)
+
 ################################################################################
 # this is part is run by the command pytest / pytest-watch / ptw -c -n -w
 
@@ -178,6 +477,95 @@ def test_sum_part2():
     assert sum([int(x) for x in gs.bad_ids(line)]) == 4174379265
 
 
+def test_check_number():
+    "Numeric checks agree with the string checks"
+    for gs in [GiftShop(), GiftShopPartTwo()]:
+        for number in range(1, 130000):
+            assert gs.check_number(number, gs.digits(number)) == gs.check_id(str(number))
+
+def test_check_id_part2_all_periods():
+    "Only testing the largest periods finds every repeated pattern"
+    gs = GiftShopPartTwo()
+
+    for number in range(1, 1300000, 7):
+        identifier = str(number)
+        repeated = any(identifier == identifier[:r] * (len(identifier) // r)
+                       for r in range(1, len(identifier) // 2 + 1)
+                       if len(identifier) % r == 0)
+
+        assert gs.check_id(identifier) == (not repeated)
+
+def test_maximal_periods():
+    assert maximal_periods(1) == ()
+    assert [period for period, multiplier in maximal_periods(12)] == [6, 4]
+    assert maximal_periods(6) == ((3, 1001), (2, 10101))
+
+def test_digits():
+    gs = GiftShop()
+
+    assert gs.digits(1) == 1
+    assert gs.digits(9) == 1
+    assert gs.digits(10) == 2
+    assert gs.digits(10**15) == 16
+
+def test_pattern_ids():
+    "Generating bad ids gives the same as checking every id"
+    ids = "1-1500,95-115,998-1012,222220-222224,565653-565659,824824821-824824827,2121212118-2121212124"
+
+    for gs in [GiftShop(), GiftShopPartTwo()]:
+        assert list(gs.generate_bad_ids(ids)) == sorted(set(gs.bad_ids(ids)), key=int)
+
+def test_pattern_ids_no_duplicates():
+    "222222 is a repeat of 2, 22 and 222 but only a single bad id"
+    gs = GiftShopPartTwo()
+
+    assert list(gs.pattern_ids(222220, 222224)) == [222222]
+    assert list(gs.pattern_ids(1, 9)) == []
+
+def test_parse_ranges():
+    "Overlapping and duplicated ranges are merged"
+    gs = GiftShop()
+
+    assert gs.parse_ranges("95-115,11-22,11-22,20-30,31-40") == [(11, 40), (95, 115)]
+    assert gs.parse_ranges("5-1234", split_lengths=True) == [(5, 9), (10, 99), (100, 999), (1000, 1234)]
+
+def test_overlaps_are_not_counted_twice():
+    gs = GiftShopPartTwo()
+
+    assert gs.bad_id_totals("11-22,11-22,15-99") == gs.bad_id_totals("11-99")
+
+def test_split_chunks():
+    assert list(split_chunks([(1, 10), (20, 22)], 4)) == [(1, 4), (5, 8), (9, 10), (20, 22)]
+
+def test_parallel_totals():
+    "Same result for any amount of workers, and the same as the closed form"
+    ids = "11-22,95-115,998-1012,1188511880-1188511890,222220-222224,1698522-1698528,446443-446449,38593856-38593862,565653-565659,824824821-824824827,2121212118-2121212124,1-150000"
+
+    expected = GiftShop().bad_id_totals(ids) + GiftShopPartTwo().bad_id_totals(ids)
+
+    for processes in [1, 4]:
+        assert parallel_totals(ids, processes, chunksize=5000) == expected
+
+    # many more chunks than can be in flight at once
+    assert parallel_totals(ids, 2, chunksize=97) == expected
+
+def test_count_and_sum():
+    "The closed form agrees with checking every single id"
+    ranges = ["1-1500", "95-115", "998-1012", "222220-222224", "100000-1000000", "2121212118-2121212124"]
+
+    for gs in [GiftShop(), GiftShopPartTwo()]:
+        for idrange in ranges:
+            bad_ids = [int(x) for x in gs.bad_ids(idrange)]
+            assert gs.bad_id_totals(idrange) == (len(bad_ids), sum(bad_ids))
+
+def test_count_and_sum_huge_range():
+    "Ranges far too wide to enumerate"
+    gs = GiftShopPartTwo()
+    bad_ids = list(gs.pattern_ids(1, 10**12))
+
+    assert gs.count_and_sum(1, 10**12) == (len(bad_ids), sum(bad_ids))
+    assert gs.count_and_sum(1, 10**30)[0] > 10**15
+
 def test_bounds():
     "33832678425 as answer is too high"
     gs = GiftShopPartTwo()
@@ -202,11 +590,11 @@ def main():
     print("* Solving part 1")
     gs = GiftShop()
 
-    print("Sum for Part1:", sum([int(x) for x in gs.bad_ids(line)]))
+    print("Sum for Part1:", gs.bad_id_totals(line)[1])
     
     print("* Solving part 2")
     gs = GiftShopPartTwo()
-    print("Sum for Part2:", sum([int(x) for x in gs.bad_ids(line)]))
+    print("Sum for Part2:", gs.bad_id_totals(line)[1])
 
 
 if __name__ == '__main__':
@@ -1,61 +1,266 @@
 #!/usr/bin/env python
 
+import numpy as np
+import pytest
+
+class BankIndex:
+    """
+    Next occurrence of every digit in a bank
+
+    Answers "leftmost largest battery in bank[start:end]" with at most ten
+    lookups, so a bank can be asked for many different k without rescanning.
+
+    Attributes:
+        bank: The bank as uint8 digits
+        nextpos: nextpos[d, i] is the first position >= i holding digit d, or len(bank)
+    """
+
+    def __init__(self, bank):
+        if isinstance(bank, str):
+            bank = bank.encode()
+
+        self.bank = np.frombuffer(bank, dtype=np.uint8) - ord("0")
+
+        size = len(self.bank)
+        self.nextpos = np.full((10, size + 1), size, dtype=np.int32)
+
+        for digit in range(10):
+            positions = np.append(np.flatnonzero(self.bank == digit), size)
+            self.nextpos[digit, :size] = positions[np.searchsorted(positions, np.arange(size))]
+
+    def leftmost_max(self, start, end):
+        "Return the position of the leftmost largest digit in bank[start:end]"
+        for digit in range(9, -1, -1):
+            position = self.nextpos[digit, start]
+            if position < end:
+                return int(position)
+
+    def max_k(self, k):
+        "Same as Joltage.max_k, using the index"
+        size = len(self.bank)
+        if k > size:
+            raise ValueError(f"Can't select {k} batteries from a bank of {size}")
+
+        joltage = 0
+        position = 0
+
+        for step in range(k):
+            position = self.leftmost_max(position, size - k + step + 1)
+            joltage = 10 * joltage + int(self.bank[position])
+            position += 1
+
+        return joltage
+
+class BankStream:
+    """
+    Running selection of k batteries for a bank that is read piece by piece
+
+    Keeps the best selection of every size 1..k of the batteries seen so far,
+    so the memory only depends on k and never on the length of the bank.
+
+    Attributes:
+        k: How many batteries to turn on
+        best: best[j] is the maximum joltage of j batteries seen so far, or None
+    """
+
+    def __init__(self, k):
+        self.k = k
+        self.best = [0] + [None] * k
+
+    def feed(self, batteries):
+        "Add the next digits of the bank"
+        if isinstance(batteries, str):
+            batteries = batteries.encode()
+
+        best = self.best
+
+        for battery in batteries:
+            battery -= ord("0")
+
+            # either keep the old selection, or append this battery to the
+            # best selection with one battery less
+            for j in range(self.k, 0, -1):
+                if best[j-1] is not None:
+                    candidate = 10 * best[j-1] + battery
+                    if best[j] is None or candidate > best[j]:
+                        best[j] = candidate
+
+    def joltage(self):
+        "Return the maximum joltage of the bank so far"
+        if self.best[self.k] is None:
+            raise ValueError(f"Can't select {self.k} batteries from this bank")
+
+        return self.best[self.k]
+
 class Joltage:
     def sum(self, banks):
         "Return the sum of joltages produced by banks parameter"
-        return sum([self.maxjoltage(bank) for bank in banks])
+        return sum([self.max_k(bank, 2) for bank in banks])
 
     def maxjoltage(self, bank):
         "Returns the maximum of joltage a bank of batteries can produce"
-
-        # find the largest number aslong as it is not the last
-        # and its position in the bank
-        left = max(list(bank[:-1]))
-        left_index = bank.index(str(left))
-
-        # we want to find the second number
-        right = max(list(bank[left_index+1:]))
-        
-        return 10 * int(left) + int(right)
+        return self.max_k(bank, 2)
 
     def sum12(self, banks):
         "Return the sum of joltages produced by banks parameter"
-        return sum([self.max12(bank) for bank in banks])
+        return sum([self.max_k(bank, 12) for bank in banks])
 
     def max12(self, bank):
         "Same as maxjoltage but for 12 batteries"
-        # Ensure bank is a list
-        bank = list(bank)
+        return self.max_k(bank, 12)
 
-        selected_batteries = []
+    def max_k(self, bank, k):
+        """
+        Return the maximum joltage of k batteries selected from the bank
 
-        popcount = 0
-        poplimit = len(bank) - 12 # amount of selectable batteries
-        
-        for battery in bank:
-            # always select the first battery
-            if len(selected_batteries) == 0:
-                selected_batteries = [battery]
-                continue
+        Picks the largest k digit subsequence with a monotonic stack in one pass.
 
+        Args:
+            bank (str | bytes): The digits of the batteries
+            k (int): How many batteries to turn on
+
+        Returns:
+            joltage (int): The selected batteries read as a number
+        """
+        if isinstance(bank, str):
+            bank = bank.encode()
+
+        if k > len(bank):
+            raise ValueError(f"Can't select {k} batteries from a bank of {len(bank)}")
+
+        selected = bytearray(k) # preallocated stack of selected batteries
+        top = 0                 # amount of selected batteries
+        poplimit = len(bank) - k # amount of batteries we may skip
+
+        for battery in bank:
             # Toss batteries that are worse than the current one
-            for _ in range(len(selected_batteries)):
-                if battery > selected_batteries[-1] and popcount < poplimit:
-                    selected_batteries.pop()
-                    popcount += 1
-                else:
-                    break
-
-            selected_batteries.append(battery)
-
-            # Did we select too many batteries?
-            while len(selected_batteries) > 12:
-                selected_batteries.pop()
-                popcount += 1
-
-        # turn the list of selected battereis into a string
-        # turn the string into an integer
-        return int(''.join(selected_batteries))
+            while top and poplimit > 0 and selected[top-1] < battery:
+                top -= 1
+                poplimit -= 1
+
+            if top < k:
+                selected[top] = battery
+                top += 1
+            else:
+                # we already have k better batteries
+                poplimit -= 1
+
+        return int(selected)
+
+    def report(self, bank, ks=range(2, 21)):
+        "Return a dict of the maximum joltage of the bank for every k in ks"
+        index = BankIndex(bank)
+
+        return {k: index.max_k(k) for k in ks}
+
+    def sum_stream(self, f, k, chunksize=1 << 20):
+        """
+        Return the sum of joltages of the banks in a binary file, without loading it
+
+        Args:
+            f: A binary file object, like open("data.txt", "rb")
+            k (int): How many batteries to turn on
+            chunksize (int): How many bytes to read at once
+        """
+        total = 0
+        stream = BankStream(k)
+        empty = True # no battery of the current bank was read yet
+
+        while True:
+            chunk = f.read(chunksize)
+            if not chunk:
+                break
+
+            lines = chunk.replace(b"\r", b"").split(b"\n")
+
+            for i, line in enumerate(lines):
+                stream.feed(line)
+                empty = empty and not line
+
+                # every newline finishes a bank, skipping empty lines
+                if i < len(lines) - 1 and not empty:
+                    total += stream.joltage()
+                    stream = BankStream(k)
+                    empty = True
+
+        if not empty:
+            total += stream.joltage()
+
+        return total
+
+    def load_banks(self, data):
+        """
+        Turn banks of equal length into a 2D array of digits
+
+        Args:
+            data (str | bytes): One bank per line, like the contents of data.txt
+
+        Returns:
+            banks (np.ndarray): uint8 array with one bank per row
+        """
+        if isinstance(data, str):
+            data = data.encode()
+
+        data = data.replace(b"\r", b"").strip(b"\n") + b"\n"
+        width = data.index(b"\n") + 1
+
+        if len(data) % width != 0:
+            raise ValueError("All banks need to have the same length")
+
+        rows = np.frombuffer(data, dtype=np.uint8).reshape(-1, width)
+
+        # a ragged file can still divide evenly, but then the newlines move
+        if not (rows[:, -1] == ord("\n")).all():
+            raise ValueError("All banks need to have the same length")
+
+        # drop the newline column
+        banks = rows[:, :-1] - ord("0")
+
+        if (banks > 9).any():
+            raise ValueError("Banks may only contain digits")
+
+        return banks
+
+    def select_batch(self, banks, k):
+        """
+        Select the best k batteries of every bank at once
+
+        Every step picks the leftmost largest digit in the window that still
+        leaves enough batteries for the remaining steps, for all rows together.
+
+        Args:
+            banks (np.ndarray): Banks as returned by load_banks
+            k (int): How many batteries to turn on
+
+        Returns:
+            selected (np.ndarray): uint8 array with the k selected digits per bank
+        """
+        rows, width = banks.shape
+        columns = np.arange(width)
+
+        selected = np.empty((rows, k), dtype=np.uint8)
+        position = np.zeros(rows, dtype=np.intp) # first selectable battery per bank
+
+        for step in range(k):
+            end = width - k + step + 1
+
+            # hide the batteries left of the window
+            window = np.where(columns[:end] >= position[:, None], banks[:, :end], np.int16(-1))
+
+            best = window.argmax(axis=1)
+            selected[:, step] = banks[np.arange(rows), best]
+            position = best + 1
+
+        return selected
+
+    def sum_batch(self, banks, k):
+        "Return the sum of joltages of all banks, with k batteries each"
+        selected = self.select_batch(banks, k)
+
+        # add up every column, so the sum can't overflow
+        columns = selected.sum(axis=0, dtype=np.int64)
+
+        return sum(int(total) * 10**(k - 1 - step) for step, total in enumerate(columns))
             
 
 ################################################################################
@@ -110,6 +315,91 @@ def test_bounds():
     assert j.sum12(lines) > 98762499745125
 
 
+def test_max_k():
+    "The stack selection matches trying every combination"
+    from itertools import combinations
+
+    j = Joltage()
+
+    for bank in ["987654321111111", "818181911112111", "2738191", "11", "5"]:
+        for k in range(1, len(bank) + 1):
+            best = max(int(''.join(c)) for c in combinations(bank, k))
+            assert j.max_k(bank, k) == best
+
+def test_max_k_long_bank():
+    j = Joltage()
+
+    assert j.max_k("1" * 100000 + "98" + "1" * 100000, 3) == 981
+
+def test_bank_index():
+    index = BankIndex("818181911112111")
+
+    assert index.leftmost_max(0, 15) == 6
+    assert index.leftmost_max(0, 6) == 0
+    assert index.leftmost_max(1, 6) == 2
+    assert index.max_k(12) == 888911112111
+
+def test_report():
+    "Index based selection matches max_k for every k"
+    with open("data.txt", "r") as f:
+        lines = f.read().splitlines()
+
+    j = Joltage()
+
+    for bank in lines[:20]:
+        assert j.report(bank) == {k: j.max_k(bank, k) for k in range(2, 21)}
+
+def test_bank_stream():
+    stream = BankStream(12)
+    stream.feed("8181819")
+    stream.feed(b"11112111")
+
+    assert stream.joltage() == 888911112111
+
+def test_sum_stream():
+    "Reading in small chunks splits banks, but the sum stays the same"
+    with open("data.txt", "r") as f:
+        lines = f.read().splitlines()
+
+    j = Joltage()
+
+    for chunksize in [7, 100, 1 << 20]:
+        with open("data.txt", "rb") as f:
+            assert j.sum_stream(f, 12, chunksize) == j.sum12(lines)
+
+def test_batch():
+    banks = "987654321111111\n811111111111119\n234234234234278\n818181911112111\n"
+
+    j = Joltage()
+    batch = j.load_banks(banks)
+
+    assert batch.shape == (4, 15)
+    assert j.sum_batch(batch, 2) == 357
+    assert j.sum_batch(batch, 12) == 3121910778619
+
+def test_load_banks_ragged():
+    j = Joltage()
+
+    with pytest.raises(ValueError):
+        j.load_banks("12\n34567890\n")
+
+    with pytest.raises(ValueError):
+        j.load_banks("123\n4567\n")
+
+    with pytest.raises(ValueError):
+        j.load_banks("123\n4 6\n")
+
+def test_batch_matches_max_k():
+    with open("data.txt", "rb") as f:
+        data = f.read()
+
+    j = Joltage()
+    banks = j.load_banks(data)
+    lines = data.decode().splitlines()
+
+    for k in [1, 2, 12, 20]:
+        assert j.sum_batch(banks, k) == sum(j.max_k(bank, k) for bank in lines)
+
 # part 1
 def test_sum():
     banks = "987654321111111\n811111111111119\n234234234234278\n818181911112111"
@@ -144,18 +434,17 @@ def test_bank4():
 # main
 
 def main():
-    with open("data.txt", "r") as f:
-        lines = f.read().splitlines()
-
     j = Joltage()
 
+    with open("data.txt", "rb") as f:
+        banks = j.load_banks(f.read())
 
     # Part 1 
-    joltage = j.sum(lines)
+    joltage = j.sum_batch(banks, 2)
     print(f"Joltage for part 1 = {joltage}")
 
     # Part 12
-    joltage = j.sum12(lines)
+    joltage = j.sum_batch(banks, 12)
     print(f"Joltage for part 2 = {joltage}")
 
     # 98762499745125 is too low
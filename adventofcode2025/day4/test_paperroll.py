@@ -9,8 +9,18 @@ np.set_printoptions(threshold=80)
 
 import pytest
 
+import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
 
 class PaperRolls:
+    # offsets of the 8 surrounding fields
+    NEIGHBOURS = [(-1, -1), (-1, 0), (-1, 1),
+                  ( 0, -1),          ( 0, 1),
+                  ( 1, -1), ( 1, 0), ( 1, 1)]
+
     def __init__(self, elfpuzzle):
         # the elf puzzle in matrix form
         self.basematrix = self.elfpuzzel2matrix(elfpuzzle)
@@ -18,29 +28,32 @@ class PaperRolls:
         # helper matrix
         self.addmat = None
 
+        # zero padded copy of the basematrix, reused by calc
+        self._padded = None
+
         # computation of the helpermatrix
         self.calc()
 
     def calc(self):
-        "Create 8 offset matrizies and add them up"
-        # to count the surrounding 8 fields of each spot
+        "Add up the 8 neighbours of every field"
+        rows, cols = self.basematrix.shape
+
+        # allocate the buffers once and reuse them on every calc
+        if self._padded is None or self._padded.shape != (rows+2, cols+2) \
+                or self._padded.dtype != self.basematrix.dtype:
+            self._padded = np.zeros((rows+2, cols+2), dtype=self.basematrix.dtype)
+            self.addmat = np.empty((rows, cols), dtype=self.basematrix.dtype)
+
+        self._padded[1:-1, 1:-1] = self.basematrix
 
         # we don't want to count already empty fields
         # so we add atleast 4 to them
-        no_paperroll = self.basematrix.copy()
-        no_paperroll[self.basematrix == 0] = 4
-        no_paperroll[no_paperroll == 1] = 0
-
-        # add every thing up
-        self.addmat = self._shift_north(self.basematrix) \
-            + self._shift_south(self.basematrix) \
-            + self._shift_east(self.basematrix) \
-            + self._shift_west(self.basematrix) \
-            + self._shift_north(self._shift_east(self.basematrix)) \
-            + self._shift_north(self._shift_west(self.basematrix)) \
-            + self._shift_south(self._shift_east(self.basematrix)) \
-            + self._shift_south(self._shift_west(self.basematrix)) \
-            + no_paperroll
+        np.subtract(1, self.basematrix, out=self.addmat)
+        self.addmat *= 4
+
+        # every neighbour is a view into the padded matrix
+        for drow, dcol in self.NEIGHBOURS:
+            self.addmat += self._padded[1+drow:1+drow+rows, 1+dcol:1+dcol+cols]
         
     def set(self, matrix):
         "Set the basematrix, required for part 2"
@@ -74,45 +87,325 @@ class PaperRolls:
 
         return removed
             
-    def __str__(self):
-        return str(self.basematrix)
+    def remove_all(self):
+        """
+        Remove paper rolls until no forklift can reach any more of them
+
+        Instead of recounting the whole matrix every round, keep the neighbour
+        counts and only revisit the rolls next to a removed one. Removing a roll
+        never makes another roll harder to reach, so the order of removal does
+        not change the outcome of the round by round part 2 loop.
+
+        Returns:
+            removed (int): How many paper rolls were removed in total
+        """
+        rows, cols = self.basematrix.shape
+        width = cols + 2
+
+        # flat, zero padded copies, so neighbours are plain index offsets
+        rolls = np.zeros((rows+2, cols+2), dtype=np.int64)
+        rolls[1:-1, 1:-1] = self.basematrix
+        counts = np.zeros((rows+2, cols+2), dtype=np.int64)
+        counts[1:-1, 1:-1] = self.addmat
+
+        frontier = np.flatnonzero((rolls == 1) & (counts < 4)).tolist()
+        rolls = rolls.ravel().tolist()
+        counts = counts.ravel().tolist()
+
+        offsets = [drow * width + dcol for drow, dcol in self.NEIGHBOURS]
+        removed = 0
+
+        while frontier:
+            cell = frontier.pop()
+            rolls[cell] = 0
+            removed += 1
+
+            for offset in offsets:
+                neighbour = cell + offset
+                if rolls[neighbour]:
+                    counts[neighbour] -= 1
+                    # just became reachable
+                    if counts[neighbour] == 3:
+                        frontier.append(neighbour)
+
+        self.set(np.array(rolls, dtype=self.basematrix.dtype).reshape(rows+2, cols+2)[1:-1, 1:-1])
+
+        return removed
+
+    def remove_parallel(self, threads=None, bands=None):
+        """
+        Run the round by round part 2 loop on row bands in a thread pool
+
+        Every round reads the previous grid and writes the next one, so the
+        bands only share their halo rows through the previous grid and every
+        round removes exactly what remove_paperrolls would. NumPy releases the
+        GIL, so the bands really run at the same time.
+
+        Args:
+            threads (int): Amount of worker threads, all cores if None
+            bands (int): Amount of row bands, threads if None
 
-    def _shift_north(self, matrix):
-        "compute a matrix that is shifted to the north"
+        Returns:
+            removed (int): How many paper rolls were removed in total
+        """
+        threads = threads or os.cpu_count()
+        rows, cols = self.basematrix.shape
 
-        matrix = np.pad(matrix, ((0,  1), (0, 0)), mode='constant')
-        matrix = np.delete(matrix, 0, 0)
+        # two zero padded grids, the current round and the next one
+        current = np.zeros((rows+2, cols+2), dtype=np.uint8)
+        current[1:-1, 1:-1] = self.basematrix
+        following = current.copy()
 
-        return matrix
+        edges = np.linspace(0, rows, min(bands or threads, rows) + 1).astype(int)
+        band_edges = list(zip(edges[:-1], edges[1:]))
 
-    def _shift_south(self, matrix):
-        "compute a matrix that is shifted to the south"
+        def step(band):
+            "Remove the reachable rolls of one band, return how many"
+            r0, r1 = band
+            neighbours = np.zeros((r1 - r0, cols), dtype=np.uint8)
+            for drow, dcol in self.NEIGHBOURS:
+                neighbours += current[1+r0+drow:1+r1+drow, 1+dcol:1+dcol+cols]
 
-        matrix = np.pad(matrix, ((1,  0), (0, 0)), mode='constant')
-        matrix = np.delete(matrix, matrix.shape[0]-1, 0)
+            rolls = current[1+r0:1+r1, 1:-1]
+            reachable = (rolls == 1) & (neighbours < 4)
 
-        return matrix
+            np.copyto(following[1+r0:1+r1, 1:-1], rolls)
+            following[1+r0:1+r1, 1:-1][reachable] = 0
 
-    def _shift_east(self, matrix):
-        "compute a matrix that is shifted to the east"
+            return int(np.count_nonzero(reachable))
 
-        matrix = np.pad(matrix, ((0,  0), (1, 0)), mode='constant')
-        matrix = np.delete(matrix, matrix.shape[1]-1, 1)
+        removed = 0
 
-        return matrix
+        with ThreadPoolExecutor(threads) as pool:
+            while True:
+                count = sum(pool.map(step, band_edges))
+                if count == 0:
+                    break
 
-    def _shift_west(self, matrix):
-        "compute a matrix that is shifted to the west"
+                removed += count
+                current, following = following, current
 
-        matrix = np.pad(matrix, ((0,  0), (0, 1)), mode='constant')
-        matrix = np.delete(matrix, 0, 1)
+        self.set(current[1:-1, 1:-1].astype(self.basematrix.dtype))
 
-        return matrix
+        return removed
+
+    def __str__(self):
+        return str(self.basematrix)
 
     def elfpuzzel2matrix(self, elfpuzzle):
         "Turns an elf puzzle into a matrix of 1 and 0"
         return np.array([[1 if ch == '@' else 0 for ch in line.strip()] for line in elfpuzzle])
 
+class PackedPaperRolls:
+    """
+    Same as PaperRolls, but stores 64 fields per machine word
+
+    Every row of the puzzle is packed into uint64 words, column c lives in
+    bit c % 64 of word c // 64. Neighbours are shifted bit planes, and instead
+    of counting them, a bitwise adder only tracks if there are at least four.
+
+    This is an alternative class with the same methods, not a backend inside
+    PaperRolls: PaperRolls exposes basematrix and addmat as int matrices, and
+    its remove_paperrolls and set exchange such matrices, so a packed backend
+    there would unpack the grid every round and lose the memory saving. Here
+    remove_paperrolls and set exchange packed grids instead, and to_matrix
+    converts when a matrix is needed.
+
+    Attributes:
+        grid: The paper rolls as uint64 array of shape (rows, words)
+        cols: Amount of columns of the puzzle
+    """
+
+    def __init__(self, elfpuzzle):
+        lines = [line.strip() for line in elfpuzzle]
+        self.cols = len(lines[0])
+
+        # compare the raw bytes, no python objects per field
+        fields = np.frombuffer("".join(lines).encode(), dtype=np.uint8).reshape(len(lines), self.cols)
+        self.grid = self.pack(fields == ord('@'))
+
+    def pack(self, matrix):
+        "Pack a boolean matrix into rows of uint64 words"
+        rows, cols = matrix.shape
+        words = -(-cols // 64)
+
+        padded = np.zeros((rows, words * 64), dtype=bool)
+        padded[:, :cols] = matrix
+
+        return np.packbits(padded, axis=1, bitorder='little').view('<u8')
+
+    def to_matrix(self):
+        "Unpack the grid into a matrix of 1 and 0, like PaperRolls.basematrix"
+        bits = np.unpackbits(self.grid.view(np.uint8), axis=1, bitorder='little')
+        return bits[:, :self.cols].astype(np.int64)
+
+    def _neighbours(self):
+        "Generate the 8 neighbour bit planes of the grid"
+        one = np.uint64(1)
+        high = np.uint64(63)
+
+        for rows in [self._shift_rows(self.grid, 1), self.grid, self._shift_rows(self.grid, -1)]:
+            # the field to the west is one bit lower, carry across words
+            west = rows << one
+            west[:, 1:] |= rows[:, :-1] >> high
+
+            # the field to the east is one bit higher
+            east = rows >> one
+            east[:, :-1] |= rows[:, 1:] << high
+
+            yield west
+            yield east
+
+            if rows is not self.grid:
+                yield rows
+
+    def _shift_rows(self, grid, offset):
+        "Move the rows down (offset 1) or up (offset -1), filling with zeros"
+        shifted = np.zeros_like(grid)
+        if offset > 0:
+            shifted[offset:] = grid[:-offset]
+        else:
+            shifted[:offset] = grid[-offset:]
+
+        return shifted
+
+    def reachable(self):
+        "Return the bit planes of forklift reachable paper rolls"
+        # two bit counter, and a flag for four or more
+        bit0 = np.zeros_like(self.grid)
+        bit1 = np.zeros_like(self.grid)
+        four = np.zeros_like(self.grid)
+
+        for plane in self._neighbours():
+            carry = bit0 & plane
+            bit0 ^= plane
+            four |= bit1 & carry
+            bit1 ^= carry
+
+        return self.grid & ~four
+
+    def forklift_reachable(self):
+        "Count how many paper rolls are forklift reachable"
+        return int(np.bitwise_count(self.reachable()).sum())
+
+    def remove_paperrolls(self):
+        "Return a grid where forklift reachable paper rolls where removed"
+        return self.grid & ~self.reachable()
+
+    def set(self, grid):
+        "Set the grid, required for part 2"
+        self.grid = grid.copy()
+
+    def __str__(self):
+        return str(self.to_matrix())
+
+class TiledPaperRolls:
+    """
+    Same as PaperRolls, but works tile by tile on a memory mapped puzzle file
+
+    Only one tile plus a one field halo is converted at a time, so the puzzle
+    does not need to fit into memory. The file needs lines of a fixed width.
+
+    Attributes:
+        path: The puzzle file
+        tile: Rows and columns of a tile
+        rows, cols: Size of the puzzle
+    """
+
+    def __init__(self, path, tile=1024):
+        self.path = path
+        self.tile = tile
+
+        with open(path, "rb") as f:
+            self.cols = len(f.readline().rstrip(b"\r\n"))
+            self.linewidth = f.tell()
+
+        # complete lines, plus a last line without newline, but no empty lines
+        size = os.path.getsize(path)
+        self.rows = size // self.linewidth
+        if size % self.linewidth >= self.cols:
+            self.rows += 1
+
+    def _fields(self, path, mode="r"):
+        "Memory map the puzzle as a (rows, cols) view of its bytes, skipping newlines"
+        data = np.memmap(path, dtype=np.uint8, mode=mode)
+        return np.ndarray((self.rows, self.cols), dtype=np.uint8, buffer=data,
+                          strides=(self.linewidth, 1))
+
+    def tiles(self):
+        "Generate the (row start, row end, column start, column end) of every tile"
+        for r0 in range(0, self.rows, self.tile):
+            for c0 in range(0, self.cols, self.tile):
+                yield r0, min(r0 + self.tile, self.rows), c0, min(c0 + self.tile, self.cols)
+
+    def _reachable(self, fields, r0, r1, c0, c1):
+        "Return a boolean matrix of the forklift reachable rolls of a tile"
+        # the tile with a halo of one field, zero outside of the puzzle
+        block = np.zeros((r1 - r0 + 2, c1 - c0 + 2), dtype=np.uint8)
+        h0, h1 = max(r0 - 1, 0), min(r1 + 1, self.rows)
+        w0, w1 = max(c0 - 1, 0), min(c1 + 1, self.cols)
+        block[h0-r0+1:h1-r0+1, w0-c0+1:w1-c0+1] = fields[h0:h1, w0:w1] == ord('@')
+
+        rows, cols = r1 - r0, c1 - c0
+        neighbours = np.zeros((rows, cols), dtype=np.uint8)
+        for drow, dcol in PaperRolls.NEIGHBOURS:
+            neighbours += block[1+drow:1+drow+rows, 1+dcol:1+dcol+cols]
+
+        return (block[1:-1, 1:-1] == 1) & (neighbours < 4)
+
+    def forklift_reachable(self):
+        "Count how many paper rolls are forklift reachable"
+        fields = self._fields(self.path)
+
+        return sum(int(np.count_nonzero(self._reachable(fields, *tile))) for tile in self.tiles())
+
+    def remove_all(self, scratch=None):
+        """
+        Remove paper rolls until no forklift can reach any more of them
+
+        Works on a copy of the puzzle file, the rolls are removed tile by tile
+        in place. Like PaperRolls.remove_all, the order of removal does not
+        change how many rolls can be removed in the end.
+
+        Args:
+            scratch: Path for the working copy, a temporary file if None
+
+        Returns:
+            removed (int): How many paper rolls were removed in total
+        """
+        if scratch is None:
+            handle, scratch = tempfile.mkstemp(suffix=".txt")
+            os.close(handle)
+            cleanup = True
+        else:
+            cleanup = False
+
+        try:
+            shutil.copyfile(self.path, scratch)
+            fields = self._fields(scratch, mode="r+")
+
+            removed = 0
+            changed = True
+
+            while changed:
+                changed = False
+
+                for r0, r1, c0, c1 in self.tiles():
+                    reachable = self._reachable(fields, r0, r1, c0, c1)
+                    count = int(np.count_nonzero(reachable))
+
+                    if count:
+                        fields[r0:r1, c0:c1][reachable] = ord('.')
+                        removed += count
+                        changed = True
+
+            del fields
+        finally:
+            if cleanup:
+                os.remove(scratch)
+
+        return removed
+
 ################################################################################
 # pytest
 
@@ -147,6 +440,117 @@ def test_remove_matrix(pr):
     # we are left with 58 rolls
     assert np.count_nonzero(removemat == 1) == 58
 
+def test_addmat(pr):
+    "Rolls get their neighbour count, empty fields at least 4"
+    assert pr.addmat[0, 0] == 4 + 2
+    assert pr.addmat[0, 2] == 3
+    assert pr.addmat[1, 1] == 6
+    assert pr.addmat[9, 9] == 4 + 2
+
+def test_calc_reuses_buffers(pr):
+    addmat = pr.addmat
+    pr.set(pr.remove_paperrolls())
+
+    assert pr.addmat is addmat
+    assert pr.forklift_reachable() == 12
+
+def test_remove_all(pr):
+    "In the example 43 rolls can be removed"
+    assert pr.remove_all() == 43
+    assert pr.forklift_reachable() == 0
+    assert np.count_nonzero(pr.basematrix) == 71 - 43
+
+@pytest.fixture
+def datalines():
+    "Lines of data.txt"
+    with open("data.txt", "r") as f:
+        return f.readlines()
+
+@pytest.fixture
+def rounds(datalines):
+    "Tally and final basematrix of the round by round part 2 loop on data.txt"
+    pr = PaperRolls(datalines)
+    tally = 0
+    while pr.forklift_reachable() > 0:
+        removemat = pr.remove_paperrolls()
+        tally += pr.forklift_reachable()
+        pr.set(removemat)
+
+    return tally, pr.basematrix
+
+def test_remove_all_matches_rounds(datalines, rounds):
+    tally, basematrix = rounds
+
+    frontier = PaperRolls(datalines)
+    assert frontier.remove_all() == tally
+    assert (frontier.basematrix == basematrix).all()
+
+@pytest.mark.parametrize("lines", [
+    ["..@@.@@@@.", "@@@.@.@.@@", "@@@@@.@.@@", "@.@@@@..@.", "@@.@@@@.@@",
+     ".@@@@@@@.@", ".@.@.@.@@@", "@.@@@.@@@@", ".@@@@@@@@.", "@.@.@@@.@."],
+    "data.txt"])
+def test_packed_matches_paperrolls(lines):
+    "Packed and unpacked grids remove the same rolls every round"
+    if lines == "data.txt":
+        with open("data.txt", "r") as f:
+            lines = f.readlines()
+
+    pr = PaperRolls(lines)
+    packed = PackedPaperRolls(lines)
+
+    assert (packed.to_matrix() == pr.basematrix).all()
+
+    while pr.forklift_reachable() > 0:
+        assert packed.forklift_reachable() == pr.forklift_reachable()
+
+        pr.set(pr.remove_paperrolls())
+        packed.set(packed.remove_paperrolls())
+
+        assert (packed.to_matrix() == pr.basematrix).all()
+
+    assert packed.forklift_reachable() == 0
+
+@pytest.mark.parametrize("threads, bands", [(1, 1), (2, 3), (4, 7), (4, None)])
+def test_remove_parallel(pr, threads, bands):
+    assert pr.remove_parallel(threads, bands) == 43
+    assert np.count_nonzero(pr.basematrix) == 71 - 43
+
+def test_remove_parallel_matches_rounds(datalines, rounds):
+    tally, basematrix = rounds
+
+    parallel = PaperRolls(datalines)
+    assert parallel.remove_parallel(4, 9) == tally
+    assert (parallel.basematrix == basematrix).all()
+
+def test_tiled_example(tmp_path):
+    path = tmp_path / "example.txt"
+    path.write_text("..@@.@@@@.\n@@@.@.@.@@\n@@@@@.@.@@\n@.@@@@..@.\n@@.@@@@.@@\n"
+                    ".@@@@@@@.@\n.@.@.@.@@@\n@.@@@.@@@@\n.@@@@@@@@.\n@.@.@@@.@.")
+
+    for tile in [1, 3, 4, 100]:
+        tiled = TiledPaperRolls(path, tile)
+        assert (tiled.rows, tiled.cols) == (10, 10)
+        assert tiled.forklift_reachable() == 13
+        assert tiled.remove_all() == 43
+
+@pytest.mark.parametrize("ending", ["", "\n", "\n\n", "\n \n"])
+def test_tiled_line_endings(tmp_path, ending):
+    "A missing final newline or trailing empty lines don't change the rows"
+    path = tmp_path / "example.txt"
+    path.write_text("@@@\n@.@\n@@@" + ending)
+
+    tiled = TiledPaperRolls(path, 2)
+    assert (tiled.rows, tiled.cols) == (3, 3)
+    assert tiled.forklift_reachable() == 4
+
+def test_tiled_matches_paperrolls(tmp_path):
+    with open("data.txt", "r") as f:
+        pr = PaperRolls(f.readlines())
+
+    tiled = TiledPaperRolls("data.txt", 32)
+    assert tiled.forklift_reachable() == pr.forklift_reachable()
+    assert tiled.remove_all(tmp_path / "scratch.txt") == pr.remove_all()
+
 def test_matrixcreation(pr):
     "Load file and convert to NumPy array"
     assert pr.basematrix.shape == (10, 10)
@@ -168,11 +572,6 @@ if __name__ == '__main__':
 
     print("* Part 2 ")
 
-    tally = 0
-
-    while pr.forklift_reachable() > 0:
-        removemat = pr.remove_paperrolls()
-        tally += pr.forklift_reachable()
-        pr.set(removemat)
+    tally = pr.remove_all()
 
     print(f"Removed paper rolls for part 2 = {tally}")
@@ -5,6 +5,9 @@
 
 import pytest
 import re
+from bisect import bisect_left, bisect_right
+
+import numpy as np
 
 class Cafeteria:
     "See https://adventofcode.com/2025/day/5"
@@ -15,51 +18,73 @@ class Cafeteria:
         """
         self.freshids = list() # IDs that are considered to be fresh
         self.freshcount = 0 # how many fresh ids are there
+        self.freshtotal = 0 # how many ids the fresh ranges cover
 
     def add_freshid(self, start, end):
         """
         Add a range of fresh ids
 
+        The ranges are kept sorted and disjoint, overlapping or touching
+        ranges are merged into one. Finding the ranges is O(log N), but
+        freshids is a plain list, so inserting shifts the ranges behind it
+        in O(N). That is a single memmove, fast in practice, but not O(log N).
+
         Args:
             start: Start of the range of fresh ids
             end:   The end of the range of fresh ids
         """
-        # is the start already included?
-        if self.isfresh(start):
-            # find what range the ingredient was in
-            idx = self.get_range_index(start)
-
-            oldstart, oldend = self.freshids[idx]
-            
-            # expand the old range
-            if oldend < end:
-                # don't touch any other ranges
-                if self.isfresh(end):
-                    a, b = self.get_range(end)
-                    end = a - 1
-                
-                self.freshids[idx] = (oldstart, end)
-
-        # is the end already listed?
-        elif self.isfresh(end):
-            ## find what range the ingredient was in
-            idx = self.get_range_index(end)
-
-            oldstart, oldend = self.freshids[idx]
-            
-            # expand the old range
-            if start < oldstart:
-                self.freshids[idx] = (start, oldend)
-
-
-        # Is it a completly new range?
-        else:
-            # Maybe not?
-            for oldstart, oldend in self.freshids:
-                if start <= oldstart <= end and start <= oldend <= end:
-                    self.freshids.remove((oldstart, oldend))
+        # first range that ends right before start or later
+        lo = bisect_left(self.freshids, start - 1, key=lambda r: r[1])
+
+        # ranges from lo up to hi overlap or touch the new range
+        hi = bisect_right(self.freshids, end + 1, key=lambda r: r[0])
+
+        if lo < hi:
+            start = min(start, self.freshids[lo][0])
+            end = max(end, self.freshids[hi-1][1])
+
+        self._replace(lo, hi, [(start, end)])
+
+    def remove_freshid(self, start, end):
+        """
+        Remove a range of fresh ids, the ids are considered expired afterwards
+
+        Ranges partially covered are cut, ranges completely covered are dropped.
+        Like add_freshid, the search is O(log N) and the list update is an
+        O(N) shift.
+
+        Args:
+            start: Start of the range of expired ids
+            end:   The end of the range of expired ids
+        """
+        # ranges from lo up to hi overlap the removed range
+        lo = bisect_left(self.freshids, start, key=lambda r: r[1])
+        hi = bisect_right(self.freshids, end, key=lambda r: r[0])
+
+        if lo >= hi:
+            return
+
+        remaining = []
+
+        # keep what sticks out on the left and right side
+        if self.freshids[lo][0] < start:
+            remaining.append((self.freshids[lo][0], start - 1))
+
+        if end < self.freshids[hi-1][1]:
+            remaining.append((end + 1, self.freshids[hi-1][1]))
+
+        self._replace(lo, hi, remaining)
 
-            self.freshids.append((start, end))
+    def _replace(self, lo, hi, ranges):
+        """
+        Replace the ranges lo up to hi, and keep the total of fresh ids up to date
+
+        The slice assignment shifts every range behind hi, O(N) per update.
+        """
+        self.freshtotal -= sum((end - start) + 1 for start, end in self.freshids[lo:hi])
+        self.freshtotal += sum((end - start) + 1 for start, end in ranges)
+
+        self.freshids[lo:hi] = ranges
 
     def isfresh(self, ingredient):
         """
@@ -72,24 +97,73 @@ class Cafeteria:
             True: The ingredient is fresh
             False: The ingredient has expired
         """
-        for start, end in self.freshids:
-            if start <= ingredient and ingredient <= end:
-                return True
+        return self.get_range_index(ingredient) is not None
+
+    def freshness(self, ingredients):
+        """
+        Check many ingredients at once
+
+        The ingredients are sorted once and joined with the sorted ranges:
+        every range covers a block of consecutive sorted ingredients, and one
+        cumulative sum over the block borders marks all fresh ingredients.
+
+        Args:
+            ingredients: An iterable or array of ingredient ids
+
+        Returns:
+            mask (np.ndarray), count (int): Which ingredients are fresh, in the
+            order they were given, and how many of them are fresh
+        """
+        ids = np.fromiter(ingredients, dtype=np.int64) if not isinstance(ingredients, np.ndarray) \
+            else ingredients.astype(np.int64, copy=False)
+
+        order = np.argsort(ids, kind="stable")
+        sorted_ids = ids[order]
+
+        bounds = np.array(self.freshids, dtype=np.int64).reshape(-1, 2)
+
+        # the block of sorted ingredients inside every range
+        first = np.searchsorted(sorted_ids, bounds[:, 0], side="left")
+        last = np.searchsorted(sorted_ids, bounds[:, 1], side="right")
+
+        borders = np.zeros(ids.size + 1, dtype=np.int64)
+        np.add.at(borders, first, 1)
+        np.add.at(borders, last, -1)
+
+        mask = np.empty(ids.size, dtype=bool)
+        mask[order] = np.cumsum(borders[:-1]) > 0
+
+        return mask, int(np.count_nonzero(mask))
+
+    def save_index(self, filepath):
+        """
+        Compile the fresh ranges into a binary file that FreshIndex can map
+
+        The file holds a header (magic and amount of ranges) followed by the
+        sorted starts and ends as little endian uint64 arrays.
+        """
+        bounds = np.array(self.freshids, dtype="<u8").reshape(-1, 2)
 
-        return False
+        with open(filepath, "wb") as f:
+            f.write(FreshIndex.MAGIC)
+            f.write(np.array([len(bounds)], dtype="<u8").tobytes())
+            f.write(np.ascontiguousarray(bounds[:, 0]).tobytes())
+            f.write(np.ascontiguousarray(bounds[:, 1]).tobytes())
 
     def get_range(self, ingredient):
         "Return the range that includes the ingredient"
-        for start, end in self.freshids:
-            if start <= ingredient and ingredient <= end:
-                return (start, end)
+        idx = self.get_range_index(ingredient)
+
+        if idx is not None:
+            return self.freshids[idx]
 
     def get_range_index(self, ingredient):
         "Return the index of the range that includes the ingredient"
-        for idx, ran in enumerate(self.freshids):
-            start, end = ran
-            if start <= ingredient and ingredient <= end:
-                return idx
+        # last range starting at or before the ingredient
+        idx = bisect_right(self.freshids, ingredient, key=lambda r: r[0]) - 1
+
+        if idx >= 0 and ingredient <= self.freshids[idx][1]:
+            return idx
 
     def parse_range(self, ingredients):
         """
@@ -112,13 +186,7 @@ class Cafeteria:
         Returns:
             count (int): Exact amount of fresh ids
         """
-        count = 0
-
-        for start, end in self.freshids:
-            count += (end - start) + 1
-            print(f"{end - start} += {end} - {start}")
-
-        return count
+        return self.freshtotal
 
     def load_file(self, filepath):
         """
@@ -137,7 +205,121 @@ class Cafeteria:
             if line.isdigit():
                 if self.isfresh(int(line)):
                     self.freshcount += 1
+
+    def merge_ranges(self, starts, ends):
+        """
+        Merge ranges with one sort and a cumulative maximum sweep
+
+        Args:
+            starts (np.ndarray): int64 starts of the ranges
+            ends (np.ndarray):   int64 ends of the ranges, inclusive
+
+        Returns:
+            starts, ends (np.ndarray): Sorted, disjoint ranges
+        """
+        if starts.size == 0:
+            return starts, ends
+
+        order = np.argsort(starts, kind="stable")
+        starts, ends = starts[order], ends[order]
+
+        # the furthest end of all ranges so far
+        reach = np.maximum.accumulate(ends)
+
+        # a range starts a new group if it doesn't touch anything before it
+        first = np.concatenate(([True], starts[1:] > reach[:-1] + 1))
+        last = np.concatenate((first[1:], [True]))
+
+        return starts[first], reach[last]
+
+    def load_file_bulk(self, filepath):
+        """
+        Load data from a file located at filepath, like load_file, but parse
+        and merge all ranges at once and check all ingredients with one
+        vectorized search
+        """
+        with open(filepath, "r") as f:
+            lines = f.read().splitlines()
+
+        # sort the lines the same way load_file does
+        ranges = [line for line in lines if "-" in line]
+        ingredients = [line for line in lines if line.isdigit()]
+
+        bounds = np.array([self.parse_range(line) for line in ranges], dtype=np.int64).reshape(-1, 2)
+        old = np.array(self.freshids, dtype=np.int64).reshape(-1, 2)
+        bounds = np.concatenate((old, bounds))
+
+        starts, ends = self.merge_ranges(bounds[:, 0], bounds[:, 1])
+        self.freshids = list(zip(starts.tolist(), ends.tolist()))
+        self.freshtotal = int((ends - starts + 1).sum())
+
+        ids = np.array(ingredients, dtype=np.int64)
+
+        # nothing can be fresh without ranges
+        if starts.size == 0:
+            return
+
+        # last range starting at or before every ingredient
+        idx = np.searchsorted(starts, ids, side="right") - 1
+        fresh = (idx >= 0) & (ids <= ends[np.maximum(idx, 0)])
+
+        self.freshcount += int(np.count_nonzero(fresh))
         
+class FreshIndex:
+    """
+    Fresh ranges compiled by Cafeteria.save_index, memory mapped read only
+
+    Opening is instant and the pages are shared between all processes that
+    map the same file.
+
+    Attributes:
+        starts: Sorted starts of the fresh ranges
+        ends:   Ends of the fresh ranges, inclusive
+    """
+    MAGIC = b"FRESHIDX"
+    HEADER = 16 # magic and the amount of ranges
+
+    def __init__(self, filepath):
+        with open(filepath, "rb") as f:
+            if f.read(len(self.MAGIC)) != self.MAGIC:
+                raise ValueError(f"{filepath} is not a compiled fresh index")
+
+            size = int(np.frombuffer(f.read(8), dtype="<u8")[0])
+
+        if size == 0:
+            self.starts = self.ends = np.zeros(0, dtype="<u8")
+            return
+
+        self.starts = np.memmap(filepath, dtype="<u8", mode="r", offset=self.HEADER, shape=(size,))
+        self.ends = np.memmap(filepath, dtype="<u8", mode="r", offset=self.HEADER + 8 * size, shape=(size,))
+
+    def freshness(self, ingredients):
+        """
+        Check many ingredients at once
+
+        Returns:
+            mask (np.ndarray), count (int): Which ingredients are fresh, and how many
+        """
+        ids = np.asarray(ingredients, dtype=np.int64)
+
+        # negative ids are never fresh, the rest compares as uint64
+        valid = ids >= 0
+        ids = np.where(valid, ids, 0).astype(np.uint64)
+
+        idx = np.searchsorted(self.starts, ids, side="right") - 1
+        mask = valid & (idx >= 0)
+        mask[mask] &= ids[mask] <= self.ends[idx[mask]]
+
+        return mask, int(np.count_nonzero(mask))
+
+    def isfresh(self, ingredient):
+        "Is the ingredient fresh?"
+        return bool(self.freshness([ingredient])[0][0])
+
+    def count(self):
+        "Count fresh ids"
+        return int((self.ends - self.starts).sum()) + len(self.starts)
+
 @pytest.fixture
 def caf():
     return Cafeteria()
@@ -147,12 +329,10 @@ def test_double_overlap(caf):
     caf.add_freshid(7, 10)
     caf.add_freshid(2, 8)
     
-    assert len(caf.freshids) == 2
+    assert len(caf.freshids) == 1
 
     assert caf.freshids[0][0] == 1
-    assert caf.freshids[0][1] == 6
-    assert caf.freshids[1][0] == 7
-    assert caf.freshids[1][1] == 10
+    assert caf.freshids[0][1] == 10
 
     assert caf.count() == 10
 
@@ -199,8 +379,8 @@ def test_inbetween(caf):
     
     assert len(caf.freshids) == 3
     assert caf.freshids[0] == (1, 10)
-    assert caf.freshids[1] == (20, 30)
-    assert caf.freshids[2] == (12, 18)
+    assert caf.freshids[1] == (12, 18)
+    assert caf.freshids[2] == (20, 30)
 
 # part 1
 def test_isfresh(caf):
@@ -264,10 +444,9 @@ def test_wierd12(caf):
     caf.add_freshid(16, 20) # 4
     caf.add_freshid(12, 18) # 6
 
-    assert caf.freshids[0] == (10, 15)
-    assert caf.freshids[1] == (16, 20)
+    assert caf.freshids[0] == (10, 20)
 
-    assert len(caf.freshids) == 2
+    assert len(caf.freshids) == 1
 
     assert caf.count() == 11
 
@@ -313,6 +492,156 @@ def test_lines(caf):
     assert len(caf.freshids) == 7
 
 
+def test_merge_many(caf):
+    "A range swallowing several ranges merges them all"
+    caf.add_freshid(20, 30)
+    caf.add_freshid(1, 3)
+    caf.add_freshid(40, 50)
+    caf.add_freshid(5, 8)
+    caf.add_freshid(9, 10) # touches 5-8
+    caf.add_freshid(25, 45)
+
+    assert caf.freshids == [(1, 3), (5, 10), (20, 50)]
+    assert caf.get_range(47) == (20, 50)
+    assert caf.get_range(4) is None
+    assert not caf.isfresh(0)
+    assert not caf.isfresh(51)
+
+def test_remove_freshid(caf):
+    caf.add_freshid(1, 10)
+    caf.add_freshid(20, 30)
+    caf.add_freshid(40, 50)
+
+    # cut a hole
+    caf.remove_freshid(4, 6)
+    assert caf.freshids == [(1, 3), (7, 10), (20, 30), (40, 50)]
+    assert not caf.isfresh(5)
+    assert caf.count() == 3 + 4 + 11 + 11
+
+    # drop some ranges, trim the others
+    caf.remove_freshid(9, 45)
+    assert caf.freshids == [(1, 3), (7, 8), (46, 50)]
+    assert caf.count() == 3 + 2 + 5
+
+    # nothing there to remove
+    caf.remove_freshid(100, 200)
+    assert caf.count() == 10
+
+    caf.add_freshid(2, 47)
+    assert caf.freshids == [(1, 50)]
+    assert caf.count() == 50
+
+def test_count_stays_up_to_date(caf):
+    "Random updates agree with a set of all fresh ids"
+    import random
+
+    rng = random.Random(2025)
+    fresh = set()
+
+    for _ in range(500):
+        start = rng.randint(0, 300)
+        end = start + rng.randint(0, 40)
+
+        if rng.random() < 0.6:
+            caf.add_freshid(start, end)
+            fresh.update(range(start, end + 1))
+        else:
+            caf.remove_freshid(start, end)
+            fresh.difference_update(range(start, end + 1))
+
+        assert caf.count() == len(fresh)
+
+    assert all(caf.isfresh(i) == (i in fresh) for i in range(-1, 350))
+
+def test_freshness(caf):
+    caf.add_freshid(3, 5)
+    caf.add_freshid(10, 14)
+    caf.add_freshid(16, 20)
+    caf.add_freshid(12, 18)
+
+    mask, count = caf.freshness([32, 1, 5, 8, 11, 17, 5])
+
+    assert mask.tolist() == [False, False, True, False, True, True, True]
+    assert count == 4
+
+    mask, count = caf.freshness(np.array([], dtype=np.int64))
+    assert count == 0
+
+def test_freshness_matches_isfresh(caf):
+    caf.load_file_bulk("data.txt")
+
+    with open("data.txt", "r") as f:
+        ids = [int(line) for line in f if line.strip().isdigit()]
+
+    mask, count = caf.freshness(iter(ids))
+
+    assert mask.tolist() == [caf.isfresh(i) for i in ids]
+    assert count == caf.freshcount
+
+def test_fresh_index(caf, tmp_path):
+    caf.load_file_bulk("data.txt")
+    caf.save_index(tmp_path / "fresh.idx")
+
+    index = FreshIndex(tmp_path / "fresh.idx")
+
+    assert index.count() == caf.count()
+
+    ids = [-5, 0] + [start for start, end in caf.freshids] \
+        + [end + 1 for start, end in caf.freshids] + [2**62]
+    mask, count = index.freshness(ids)
+
+    assert mask.tolist() == [caf.isfresh(i) for i in ids]
+    assert index.isfresh(caf.freshids[0][1])
+    assert not index.isfresh(caf.freshids[0][1] + 1)
+
+def test_fresh_index_empty(caf, tmp_path):
+    caf.save_index(tmp_path / "empty.idx")
+    index = FreshIndex(tmp_path / "empty.idx")
+
+    assert index.count() == 0
+    assert not index.isfresh(1)
+
+def test_load_file_bulk_whitespace_separator(caf, tmp_path):
+    "A separator line holding spaces is still a separator"
+    path = tmp_path / "ingredients.txt"
+    path.write_text("3-5\n10-14\n \n1\n5\n")
+
+    caf.load_file_bulk(path)
+
+    incremental = Cafeteria()
+    incremental.load_file(path)
+
+    assert caf.freshids == incremental.freshids == [(3, 5), (10, 14)]
+    assert caf.freshcount == incremental.freshcount == 1
+
+def test_load_file_bulk_without_ranges(caf, tmp_path):
+    path = tmp_path / "ingredients.txt"
+    path.write_text("\n1\n5\n12\n")
+
+    caf.load_file_bulk(path)
+
+    assert caf.freshids == []
+    assert caf.freshcount == 0
+
+def test_merge_ranges(caf):
+    starts = np.array([16, 3, 10, 12, 21, 40], dtype=np.int64)
+    ends = np.array([20, 5, 14, 18, 22, 41], dtype=np.int64)
+
+    starts, ends = caf.merge_ranges(starts, ends)
+
+    assert starts.tolist() == [3, 10, 40]
+    assert ends.tolist() == [5, 22, 41]
+
+def test_load_file_bulk(caf):
+    caf.load_file_bulk("data.txt")
+
+    incremental = Cafeteria()
+    incremental.load_file("data.txt")
+
+    assert caf.freshids == incremental.freshids
+    assert caf.freshcount == incremental.freshcount
+    assert caf.count() == incremental.count()
+
 def test_bounds(caf):
     caf.load_file("data.txt")
     count = caf.count()
@@ -322,7 +651,7 @@ def test_bounds(caf):
 def main():
 
     caf = Cafeteria()
-    caf.load_file("data.txt")
+    caf.load_file_bulk("data.txt")
     print(f"Freshcount: {caf.freshcount}")
 
     print("* Part 2")
@@ -7,8 +7,11 @@ import pytest
 
 from collections import deque
 from functools import reduce
+import math
 import operator
 
+import numpy as np
+
 def calc(data):
     """
     Reverse polish notation calculator for part 1 of AoC 2025 day 6
@@ -103,6 +106,90 @@ def calc2(data):
 
     return tally
 
+def worksheet(data):
+    """
+    Turn a cephalopod worksheet into a 2D array of bytes
+
+    Args:
+        data (str | list): Cephalopod math formated data
+
+    Returns:
+        grid (np.ndarray): uint8 array, one row per line, short lines padded with spaces
+    """
+    if isinstance(data, str):
+        data = data.splitlines()
+
+    lines = [line.encode() for line in data]
+
+    # the operators have to be the last row
+    while lines and not lines[-1].strip():
+        lines.pop()
+
+    width = max(len(line) for line in lines)
+
+    buf = b"".join(line.ljust(width) for line in lines)
+    return np.frombuffer(buf, dtype=np.uint8).reshape(len(lines), width)
+
+def check_digits(exponents):
+    "Raise a ValueError if a number has more digits than int64 can hold"
+    if exponents.size and exponents.max() >= 18:
+        raise ValueError("Numbers with more than 18 digits don't fit into int64, use calc and calc2")
+
+def solve(data):
+    """
+    Solve part 1 and part 2 of AoC 2025 day 6 in one pass over the worksheet
+
+    Problems are blocks of columns separated by blank columns. Part 1 reads
+    the numbers of a block row by row, part 2 column by column.
+
+    Args:
+        data (str | list): Cephalopod math formated data
+
+    Returns:
+        tally1, tally2 (int): The results of calc and calc2
+
+    Raises:
+        ValueError: A number has more than 18 digits
+    """
+    grid = worksheet(data)
+
+    # drop the blank separator columns, and remember where blocks start
+    blank = (grid == ord(" ")).all(axis=0)
+    first = ~blank & np.concatenate(([True], blank[:-1]))
+    grid = grid[:, ~blank]
+    starts = np.flatnonzero(first[~blank])
+
+    numbers = grid[:-1]
+    isdigit = (numbers >= ord("0")) & (numbers <= ord("9"))
+    digits = np.where(isdigit, numbers.astype(np.int64) - ord("0"), 0)
+
+    # the operator is the only non blank byte in the last row of a block
+    operators = np.maximum.reduceat(grid[-1], starts)
+    multiply = operators == ord("*")
+
+    # part 1: every digit is worth 10 to the power of the digits right of it in its block
+    ends = np.append(starts[1:], grid.shape[1]) - 1
+    block = np.repeat(np.arange(len(starts)), np.diff(np.append(starts, grid.shape[1])))
+    seen = np.cumsum(isdigit, axis=1)
+    right = np.where(isdigit, seen[:, ends[block]] - seen, 0)
+    check_digits(right)
+    rows = np.add.reduceat(digits * 10**right, starts, axis=1)
+
+    # sums and products are taken as python integers, int64 would silently overflow
+    part1 = sum(rows[:, ~multiply].ravel().tolist()) \
+        + sum(math.prod(numbers) for numbers in rows[:, multiply].T.tolist())
+
+    # part 2: every digit is worth 10 to the power of the digits below it in its column
+    below = np.where(isdigit, np.cumsum(isdigit[::-1], axis=0)[::-1] - isdigit, 0)
+    check_digits(below)
+    columns = (digits * 10**below).sum(axis=0)
+
+    blocks = np.split(columns, starts[1:])
+    part2 = sum(columns[~multiply[block]].tolist()) \
+        + sum(math.prod(blocks[b].tolist()) for b in np.flatnonzero(multiply))
+
+    return part1, part2
+
 ################################################################################
 # pytest
 @pytest.fixture
@@ -120,6 +207,42 @@ def test_part2(data):
     data = data.splitlines()
     assert calc2(data) == 3263827
 
+def test_solve(data):
+    assert solve(data) == (4277556, 3263827)
+
+def test_solve_large_products():
+    "Products of many numbers don't fit into int64"
+    data = "9999 9999\n9999 9999\n9999 9999\n9999 9999\n9999 9999\n*    +   "
+
+    assert solve(data) == (calc(data), calc2(data))
+    assert solve(data)[0] == 9999**5 + 5 * 9999
+
+def test_solve_trailing_blank_lines(data):
+    assert solve(data + "\n") == (4277556, 3263827)
+    assert solve(data + "\n   \n\n") == (4277556, 3263827)
+
+def test_solve_too_many_digits():
+    "Numbers with 19 or more digits are rejected instead of wrapping around"
+    # part 1, a row number with 20 digits
+    with pytest.raises(ValueError):
+        solve("12345678901234567890 5\n                   1 5\n+                    +")
+
+    # part 2, a column number with 19 digits
+    with pytest.raises(ValueError):
+        solve("1\n" * 19 + "+")
+
+def test_solve_large_sums():
+    "Sums of 18 digit numbers don't fit into int64 either"
+    data = "999999999999999999\n" * 10 + "+"
+
+    assert solve(data)[0] == calc(data) == 10 * 999999999999999999
+
+def test_solve_matches_calc():
+    with open("data.txt", "r") as f:
+        lines = f.read()
+
+    assert solve(lines) == (calc(lines), calc2(lines.splitlines()))
+
 ################################################################################
 # main
 #
@@ -127,13 +250,13 @@ def test_part2(data):
 
 if __name__ == '__main__':
 
-    print("* Part 1")
     with open("data.txt", "r") as f:
         lines = f.read()
 
-    s = calc(lines)
-    print(f"Sum = {s}")
+    part1, part2 = solve(lines)
+
+    print("* Part 1")
+    print(f"Sum = {part1}")
 
     print("* Part 2 ")
-    s = calc2(lines.splitlines())
-    print(f"Sum = {s}")
+    print(f"Sum = {part2}")